@@ -1,74 +1,205 @@
+import io
+
 import streamlit as st
 import numpy as np
-from sklearn.cluster import KMeans
-from collections import Counter
 from PIL import Image
-import matplotlib.pyplot as plt
-from kneed import KneeLocator
 
 
-def get_dominant_colors(image, num_colors=5):
+@st.cache_data(show_spinner=False)
+def load_pixels(image_bytes):
+    """
+    Membaca berkas gambar dan mengubahnya menjadi array piksel RGB.
+
+    Gambar diperkecil terlebih dahulu hingga maksimal 512x512 piksel, karena
+    palet warna dominan hasil thumbnail praktis sama dengan gambar aslinya.
+    Resampling NEAREST dipakai agar tidak muncul warna campuran baru di tepi objek.
+
+    Args:
+        image_bytes (bytes): Isi berkas gambar yang diunggah.
+
+    Returns:
+        numpy.ndarray: Array piksel gambar (Nx3) bertipe float32.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.thumbnail((512, 512), Image.Resampling.NEAREST)
+    image = image.convert("RGB")
+    return np.frombuffer(image.tobytes(), dtype=np.uint8).reshape(-1, 3).astype(np.float32)
+
+@st.cache_data(show_spinner=False)
+def load_color_histogram(image_bytes):
+    """
+    Mengkuantisasi piksel gambar menjadi 5 bit per kanal dan menghitung
+    histogram warna unik hasil kuantisasi.
+
+    Args:
+        image_bytes (bytes): Isi berkas gambar yang diunggah.
+
+    Returns:
+        tuple: Array warna unik (Ux3) bertipe float32 berupa rata-rata warna
+            asli di setiap bin, dan array jumlah piksel untuk setiap warna tersebut.
+    """
+    pixels = load_pixels(image_bytes)
+    quantized = pixels.astype(np.uint32) >> 3
+    keys = (quantized[:, 0] << 10) | (quantized[:, 1] << 5) | quantized[:, 2]
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    # Rata-rata warna asli per bin, agar gambar dengan warna datar tetap menghasilkan kode hex yang tepat
+    channel_sums = [
+        np.bincount(inverse, weights=pixels[:, c], minlength=len(unique_keys)) for c in range(3)
+    ]
+    unique_colors = np.float32(np.stack(channel_sums, axis=1) / counts[:, None])
+    return unique_colors, counts
+
+def count_main_colors(counts, coverage=0.99):
+    """
+    Menghitung jumlah bin warna terbesar yang bersama-sama mencakup sebagian
+    besar piksel. Warna campuran di tepi objek (antialiasing, artefak JPEG) hanya
+    mencakup sedikit piksel, sehingga tidak ikut terhitung.
+
+    Args:
+        counts (numpy.ndarray): Jumlah piksel untuk setiap bin warna.
+        coverage (float): Proporsi piksel yang harus tercakup.
+
+    Returns:
+        int: Jumlah bin warna utama.
+    """
+    cumulative = np.cumsum(np.sort(counts)[::-1])
+    return int(np.searchsorted(cumulative, coverage * cumulative[-1])) + 1
+
+@st.cache_data(show_spinner=False)
+def get_dominant_colors(image_bytes, num_colors=5, use_kmeans=False):
     """
-    Ekstrak warna dominan dari gambar menggunakan KMeans clustering.
+    Ekstrak warna dominan dari gambar.
+
+    Secara default palet dihitung dengan kuantisasi Median Cut bawaan PIL yang
+    disempurnakan dengan beberapa iterasi k-means (juga di dalam PIL).
+    Jika use_kmeans aktif, palet berupa centroid hasil KMeans clustering.
+    Jika gambar hanya memiliki sedikit warna utama, rata-rata warna bin
+    histogram terbesar langsung dipakai tanpa kuantisasi maupun KMeans.
+    Warna diurutkan berdasarkan jumlah piksel anggotanya.
 
     Args:
-        image (PIL.Image.Image): Objek gambar PIL.
+        image_bytes (bytes): Isi berkas gambar yang diunggah.
         num_colors (int): Jumlah warna dominan yang ingin diekstrak.
+        use_kmeans (bool): Gunakan KMeans clustering alih-alih kuantisasi PIL.
 
     Returns:
         numpy.ndarray: Array NumPy berisi nilai RGB dari warna dominan.
     """
-    if image.mode != "RGB":
-        image = image.convert("RGB")
+    unique_colors, counts = load_color_histogram(image_bytes)
 
-    img_np = np.array(image)
-    pixels = img_np.reshape(-1, 3)
-    pixels = np.float32(pixels)
+    # Gambar dengan sedikit warna (logo, tangkapan layar): bin terbesar sudah mencakup hampir
+    # semua piksel, sehingga rata-rata warna tiap bin langsung dipakai sebagai palet
+    if count_main_colors(counts) <= num_colors:
+        order = np.argsort(-counts)[:num_colors]
+        return np.array(np.rint(unique_colors[order]), dtype=int)
 
-    kmeans = KMeans(n_clusters=num_colors, random_state=42, n_init=10)
-    kmeans.fit(pixels)
+    if not use_kmeans:
+        # Kuantisasi tidak bergantung pada posisi piksel, jadi piksel cukup disusun sebagai gambar 1xN
+        pixels = load_pixels(image_bytes).astype(np.uint8).reshape(1, -1, 3)
+        quantized = Image.fromarray(pixels).quantize(colors=num_colors, method=Image.Quantize.MEDIANCUT, kmeans=3)
 
-    colors = kmeans.cluster_centers_
-    labels = kmeans.predict(pixels)
-    label_counts = Counter(labels)
-    sorted_colors = [colors[i] for i, _ in label_counts.most_common()]
+        palette = np.array(quantized.getpalette()[:num_colors * 3]).reshape(-1, 3)
+        label_counts = np.bincount(np.asarray(quantized).ravel(), minlength=len(palette))[:len(palette)]
+        # Entri palet yang tidak dipakai satu piksel pun diabaikan
+        order = [i for i in np.argsort(-label_counts) if label_counts[i] > 0]
+        return np.array(palette[order], dtype=int)
+
+    from kmeans_rgb import fit_kmeans_rgb
+
+    colors, labels, _ = fit_kmeans_rgb(
+        unique_colors, np.float64(counts), n_clusters=num_colors, n_init=10
+    )
+    label_counts = np.bincount(labels, weights=counts, minlength=len(colors))
+    sorted_colors = colors[np.argsort(-label_counts)]
 
     return np.array(sorted_colors, dtype=int)
 
-def rgb_to_hex(rgb):
+HEX_TABLE = np.array([f"{i:02x}" for i in range(256)])
+
+def palette_to_hex(palette):
     """
-    Konversi nilai RGB ke format heksadesimal.
+    Konversi seluruh palet warna RGB ke format heksadesimal sekaligus.
 
     Args:
-        rgb (tuple/list/numpy.ndarray): Tuple atau array berisi nilai RGB (0-255).
+        palette (numpy.ndarray): Array berisi nilai RGB (Nx3, 0-255).
 
     Returns:
-        str: String kode heksadesimal warna.
+        list: Daftar string kode heksadesimal untuk setiap warna.
     """
-    return f"#{int(rgb[0]):02x}{int(rgb[1]):02x}{int(rgb[2]):02x}"
+    channels = HEX_TABLE[np.clip(palette, 0, 255).astype(np.uint8)]
+    return ["#" + "".join(hex_rgb) for hex_rgb in channels]
 
-def calculate_wcss(pixels, max_k=15):
+@st.cache_data(show_spinner=False)
+def calculate_wcss(image_bytes, max_k=15):
     """
     Menghitung Within-Cluster Sum of Squares (WCSS) untuk berbagai nilai k.
 
     Args:
-        pixels (numpy.ndarray): Array piksel gambar (Nx3).
+        image_bytes (bytes): Isi berkas gambar yang diunggah.
         max_k (int): Nilai k maksimum yang akan diuji.
 
     Returns:
         list: Daftar nilai WCSS untuk setiap k dari 1 hingga max_k.
     """
+    from kmeans_rgb import lloyd_rgb
+
+    unique_colors, counts = load_color_histogram(image_bytes)
+    weights = np.float64(counts)
     wcss = []
-    num_samples = min(len(pixels), 100000)
-    sample_indices = np.random.choice(len(pixels), num_samples, replace=False)
-    sampled_pixels = pixels[sample_indices]
-
-    for i in range(1, max_k + 1):
-        kmeans = KMeans(n_clusters=i, random_state=42, n_init=10)
-        kmeans.fit(sampled_pixels)
-        wcss.append(kmeans.inertia_)
+
+    rng = np.random.default_rng(42)
+
+    # Untuk k=1 centroid optimal adalah rata-rata berbobot seluruh warna
+    centers = np.average(unique_colors, axis=0, weights=weights)[np.newaxis]
+    centers, labels, inertia = lloyd_rgb(unique_colors, weights, centers, 20)
+    wcss.append(inertia)
+
+    # Jumlah kluster tidak boleh melebihi jumlah warna unik
+    for _ in range(2, min(max_k, len(unique_colors)) + 1):
+        # WCSS sudah di bawah 1% dari k=1, titik elbow pasti sudah terlewati
+        if inertia < 0.01 * wcss[0]:
+            break
+
+        # Warm start untuk k: centroid k-1 ditambah satu centroid baru yang dipilih dengan
+        # peluang sebanding kontribusi WCSS (aturan k-means++). Karena centroid lama sudah
+        # hampir konvergen, beberapa iterasi Lloyd sudah cukup
+        contributions = weights * ((unique_colors - centers[labels]) ** 2).sum(axis=1)
+        candidate = rng.choice(len(unique_colors), p=contributions / contributions.sum())
+        centers, labels, inertia = lloyd_rgb(unique_colors, weights, np.vstack([centers, unique_colors[candidate]]), 5)
+        wcss.append(inertia)
     return wcss
 
+def find_elbow(k_range, wcss_values, S=1.0):
+    """
+    Mendeteksi titik siku pada kurva cembung menurun dengan algoritma Kneedle.
+
+    Args:
+        k_range (list): Daftar nilai k.
+        wcss_values (list): Daftar nilai WCSS yang sesuai dengan k.
+        S (float): Sensitivitas deteksi; semakin besar, semakin konservatif.
+
+    Returns:
+        int | None: Nilai k pada titik siku, atau None jika tidak terdeteksi.
+    """
+    x = np.asarray(k_range, dtype=float)
+    y = np.asarray(wcss_values, dtype=float)
+    if len(x) < 3 or y.max() == y.min():
+        return None
+
+    # Normalisasi ke [0, 1]; sumbu y dibalik agar kurva menurun menjadi kurva naik
+    x_norm = (x - x.min()) / (x.max() - x.min())
+    y_norm = (y.max() - y) / (y.max() - y.min())
+    diff = y_norm - x_norm
+
+    peaks = np.where((diff[1:-1] > diff[:-2]) & (diff[1:-1] > diff[2:]))[0] + 1
+    threshold_step = S * np.diff(x_norm).mean()
+    for peak, next_peak in zip(peaks, [*peaks[1:], len(diff)]):
+        # Titik siku valid jika selisih turun di bawah ambang sebelum puncak berikutnya
+        if np.any(diff[peak + 1:next_peak] < diff[peak] - threshold_step):
+            return int(x[peak])
+    return None
+
 def find_optimal_k_elbow(wcss_values, k_range):
     """
     Mendeteksi titik 'siku' pada kurva WCSS untuk menentukan k optimal.
@@ -80,13 +211,47 @@ def find_optimal_k_elbow(wcss_values, k_range):
     Returns:
         int: Nilai k optimal yang terdeteksi.
     """
-    try:
-        kneedle = KneeLocator(k_range, wcss_values, S=1.0, curve='convex', direction='decreasing', interp_method='polynomial')
-        # Pastikan k minimal 2 jika elbow terdeteksi 1, karena untuk palet warna butuh minimal 2
-        return max(2, kneedle.elbow) if kneedle.elbow is not None else 5
-    except Exception as e:
-        st.warning(f"Gagal mendeteksi titik elbow, menggunakan k=5 sebagai default. Error: {e}")
-        return 5
+    elbow = find_elbow(k_range, wcss_values, S=1.0)
+    # Pastikan k minimal 2 jika elbow terdeteksi 1, karena untuk palet warna butuh minimal 2
+    return max(2, elbow) if elbow is not None else 5
+
+def plot_elbow_curve(k_range, wcss_values, optimal_k):
+    """
+    Membuat grafik kurva elbow beserta penanda k optimal.
+
+    Args:
+        k_range (list): Nilai-nilai k yang diuji.
+        wcss_values (list): Nilai WCSS untuk setiap k.
+        optimal_k (int): Nilai k optimal yang terdeteksi.
+
+    Returns:
+        altair.LayerChart: Grafik kurva elbow yang dirender di sisi browser.
+    """
+    import pandas as pd
+    import altair as alt
+
+    elbow_data = pd.DataFrame({"k": k_range, "WCSS": wcss_values})
+    curve = alt.Chart(elbow_data).mark_line(point=True, color='#61DAFB', strokeWidth=2.5).encode(
+        x=alt.X('k:Q', title='Jumlah Kluster (k)', axis=alt.Axis(tickMinStep=1)),
+        y=alt.Y('WCSS:Q', title='WCSS (Within-Cluster Sum of Squares)'),
+        tooltip=['k', 'WCSS']
+    )
+    optimal_rule = alt.Chart(pd.DataFrame({"k": [optimal_k]})).mark_rule(
+        color='#FF5733', strokeDash=[6, 4], strokeWidth=2
+    ).encode(x='k:Q')
+
+    return (curve + optimal_rule).properties(
+        title=alt.TitleParams('Kurva Elbow untuk Penentuan Kluster Optimal', subtitle=f'k Optimal = {optimal_k}'),
+        height=400
+    ).configure(
+        background='#2B2B2B'
+    ).configure_title(
+        color='#F8F8F8', subtitleColor='#FF5733', fontSize=18
+    ).configure_axis(
+        labelColor='#BBBBBB', titleColor='#E0E0E0', gridColor='#555', gridDash=[2, 2]
+    ).configure_view(
+        strokeWidth=0
+    )
 
 st.set_page_config(
     page_title="Menentukan Warna Dominan",
@@ -338,8 +503,7 @@ if uploaded_file is not None:
             """, unsafe_allow_html=True
         )
 
-    img_np_for_processing = np.array(image.convert("RGB"))
-    pixels_for_processing = np.float32(img_np_for_processing.reshape(-1, 3))
+    image_bytes = uploaded_file.getvalue()
 
     st.subheader("Analisis Klustering Optimal (Metode Elbow)")
     st.markdown(
@@ -353,26 +517,27 @@ if uploaded_file is not None:
 
     with st.spinner("Melakukan analisis WCSS untuk penentuan $k$ optimal..."):
         max_k_to_test = 10
-        k_range = list(range(1, max_k_to_test + 1))
-        wcss_values = calculate_wcss(pixels_for_processing, max_k=max_k_to_test)
-    
-        optimal_k = find_optimal_k_elbow(wcss_values, k_range)
-
-        fig, ax = plt.subplots(figsize=(10, 6)) 
-        ax.plot(k_range, wcss_values, marker='o', linestyle='-', color='#61DAFB', linewidth=2.5) 
-        ax.axvline(x=optimal_k, color='#FF5733', linestyle='--', label=f'k Optimal = {optimal_k}', linewidth=2) 
-        ax.set_title('Kurva Elbow untuk Penentuan Kluster Optimal', fontsize=18, color='#F8F8F8')
-        ax.set_xlabel('Jumlah Kluster (k)', fontsize=14, color='#E0E0E0')
-        ax.set_ylabel('WCSS (Within-Cluster Sum of Squares)', fontsize=14, color='#E0E0E0')
-        ax.tick_params(axis='both', which='major', colors='#BBBBBB')
-        ax.set_facecolor('#2B2B2B') 
-        fig.patch.set_facecolor('#2B2B2B') 
-        ax.legend(fontsize=12, facecolor='#2B2B2B', edgecolor='#444', labelcolor='#F8F8F8')
-        ax.grid(True, linestyle=':', alpha=0.5, color='#555')
-        plt.tight_layout()
-        st.pyplot(fig)
-
-        st.success(f"Berdasarkan analisis  menggunakan Metode Elbow, jumlah kluster yang terdeteksi adalah: **{optimal_k}**.")
+        unique_colors, counts = load_color_histogram(image_bytes)
+        main_colors = count_main_colors(counts)
+
+        if main_colors <= 8:
+            # Gambar dengan sedikit warna (logo, tangkapan layar): setiap warna utama menjadi satu kluster
+            optimal_k = main_colors
+
+            st.success(f"Gambar hanya memiliki **{optimal_k}** warna utama (mencakup 99% piksel), sehingga analisis elbow dilewati dan setiap warna dijadikan satu kluster.")
+        else:
+            wcss_values = calculate_wcss(image_bytes, max_k=max_k_to_test)
+            k_range = list(range(1, len(wcss_values) + 1))
+
+            # Kurva yang dihentikan lebih awal dilengkapi dengan nilai WCSS terakhir hingga max_k,
+            # karena Kneedle pada kurva 3-4 titik hampir selalu gagal mendeteksi elbow
+            full_k_range = list(range(1, min(max_k_to_test, len(unique_colors)) + 1))
+            padded_wcss = wcss_values + [wcss_values[-1]] * (len(full_k_range) - len(wcss_values))
+            optimal_k = min(find_optimal_k_elbow(padded_wcss, full_k_range), len(k_range))
+
+            st.altair_chart(plot_elbow_curve(k_range, wcss_values, optimal_k), use_container_width=True)
+
+            st.success(f"Berdasarkan analisis  menggunakan Metode Elbow, jumlah kluster yang terdeteksi adalah: **{optimal_k}**.")
 
     st.subheader("Visualisasi Palet Warna Dominan")
     st.markdown(
@@ -382,24 +547,25 @@ if uploaded_file is not None:
         """
     )
 
+    use_kmeans = st.checkbox(
+        "Gunakan _K-Means_ untuk ekstraksi palet",
+        help="Secara default palet dihitung dengan kuantisasi _Median Cut_ yang jauh lebih cepat. "
+             "Aktifkan untuk memperoleh palet berbasis _centroid_ K-Means."
+    )
+
     with st.spinner(f"Mengekstrak {optimal_k} warna dominan..."):
-        dominant_colors = get_dominant_colors(image, num_colors=optimal_k)
-
-        st.markdown('<div class="color-palette-container">', unsafe_allow_html=True)
-        for i, color_rgb in enumerate(dominant_colors):
-            hex_code = rgb_to_hex(color_rgb)
-            st.markdown(
-                f"""
-                <div class="color-item-wrapper">
-                    <div class="color-box" style="background-color: {hex_code};"></div>
-                    <div class="hex-code" onclick="navigator.clipboard.writeText('{hex_code}'); alert('Kode heksadesimal disalin: {hex_code}');">
-                        {hex_code}
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-        st.markdown('</div>', unsafe_allow_html=True)
+        dominant_colors = get_dominant_colors(image_bytes, num_colors=optimal_k, use_kmeans=use_kmeans)
+
+        hex_codes = palette_to_hex(dominant_colors)
+
+        palette_items = ''.join(
+            '<div class="color-item-wrapper">'
+            f'<div class="color-box" style="background-color: {hex_code};"></div>'
+            f'<div class="hex-code" onclick="navigator.clipboard.writeText(\'{hex_code}\'); alert(\'Kode heksadesimal disalin: {hex_code}\');">{hex_code}</div>'
+            '</div>'
+            for hex_code in hex_codes
+        )
+        st.markdown(f'<div class="color-palette-container">{palette_items}</div>', unsafe_allow_html=True)
 
         st.info("Klik pada kode heksadesimal untuk menyalinnya ke _clipboard_.")
 
@@ -419,6 +585,10 @@ st.markdown(
     mengindikasikan di mana penambahan jumlah kluster tidak lagi memberikan pengurangan WCSS yang
     substansial, menandai $k$ optimal yang menyeimbangkan kohesi kluster dengan kompleksitas model.
     Deteksi titik _elbow_ ini diotomatisasi untuk meningkatkan efisiensi proses.
+
+    Setelah $k$ ditentukan, palet akhir secara default diekstraksi dengan kuantisasi **_Median Cut_**
+    bawaan PIL yang jauh lebih cepat, sementara ekstraksi berbasis _centroid_ _K-Means_ tetap dapat
+    dipilih melalui opsi pada bagian palet.
     """
 )
 st.markdown(
@@ -0,0 +1,153 @@
+import threading
+
+import numpy as np
+from numba import config, njit, prange
+
+# Streamlit menjalankan skrip di thread terpisah per sesi; OpenMP aman dipanggil dari
+# banyak thread, sedangkan TBB dapat menggantung proses saat keluar pada beberapa instalasi
+config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+
+# Layer workqueue (dipakai jika OpenMP dan TBB tidak tersedia) tidak aman dipanggil
+# bersamaan dari beberapa thread dan dapat menghentikan proses server. Kernel paralel
+# sudah memakai semua core, sehingga menjalankannya bergantian tidak memperlambat
+KERNEL_LOCK = threading.Lock()
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def assign_rgb(colors, weights, centers, labels):
+    """
+    Memetakan setiap warna RGB ke centroid terdekat.
+
+    Dimensi warna (3) ditulis eksplisit agar perhitungan jarak dapat
+    divektorisasi oleh kompiler.
+
+    Args:
+        colors (numpy.ndarray): Array warna (Nx3).
+        weights (numpy.ndarray): Bobot (jumlah piksel) setiap warna.
+        centers (numpy.ndarray): Centroid kluster (kx3).
+        labels (numpy.ndarray): Array keluaran untuk indeks centroid terdekat.
+
+    Returns:
+        float: Total jarak kuadrat berbobot terhadap centroid terdekat (WCSS).
+    """
+    inertia = 0.0
+    for i in prange(colors.shape[0]):
+        r = colors[i, 0]
+        g = colors[i, 1]
+        b = colors[i, 2]
+        best_label = 0
+        best_dist = (r - centers[0, 0]) ** 2 + (g - centers[0, 1]) ** 2 + (b - centers[0, 2]) ** 2
+        for j in range(1, centers.shape[0]):
+            dist = (r - centers[j, 0]) ** 2 + (g - centers[j, 1]) ** 2 + (b - centers[j, 2]) ** 2
+            if dist < best_dist:
+                best_dist = dist
+                best_label = j
+        labels[i] = best_label
+        inertia += weights[i] * best_dist
+    return inertia
+
+@njit(fastmath=True, cache=True)
+def lloyd_rgb_kernel(colors, weights, centers, n_iter):
+    """
+    Menjalankan iterasi Lloyd (KMeans) berbobot pada warna RGB.
+
+    Args:
+        colors (numpy.ndarray): Array warna (Nx3).
+        weights (numpy.ndarray): Bobot (jumlah piksel) setiap warna.
+        centers (numpy.ndarray): Centroid awal (kx3).
+        n_iter (int): Jumlah iterasi maksimum.
+
+    Returns:
+        tuple: Centroid akhir, label setiap warna, dan nilai WCSS.
+    """
+    k = centers.shape[0]
+    centers = centers.copy()
+    labels = np.empty(colors.shape[0], dtype=np.int64)
+
+    for _ in range(n_iter):
+        assign_rgb(colors, weights, centers, labels)
+
+        sums = np.zeros((k, 3))
+        totals = np.zeros(k)
+        for i in range(colors.shape[0]):
+            j = labels[i]
+            sums[j, 0] += weights[i] * colors[i, 0]
+            sums[j, 1] += weights[i] * colors[i, 1]
+            sums[j, 2] += weights[i] * colors[i, 2]
+            totals[j] += weights[i]
+
+        shift = 0.0
+        for j in range(k):
+            if totals[j] > 0:
+                for c in range(3):
+                    new_center = sums[j, c] / totals[j]
+                    shift += (new_center - centers[j, c]) ** 2
+                    centers[j, c] = new_center
+        if shift < 1e-4:
+            break
+
+    inertia = assign_rgb(colors, weights, centers, labels)
+    return centers, labels, inertia
+
+def lloyd_rgb(colors, weights, centers, n_iter):
+    """
+    Menjalankan iterasi Lloyd berbobot dengan memegang KERNEL_LOCK agar kernel
+    paralel tidak dipanggil bersamaan oleh beberapa sesi.
+
+    Args:
+        colors (numpy.ndarray): Array warna (Nx3).
+        weights (numpy.ndarray): Bobot (jumlah piksel) setiap warna.
+        centers (numpy.ndarray): Centroid awal (kx3).
+        n_iter (int): Jumlah iterasi maksimum.
+
+    Returns:
+        tuple: Centroid akhir, label setiap warna, dan nilai WCSS.
+    """
+    with KERNEL_LOCK:
+        return lloyd_rgb_kernel(colors, weights, centers, n_iter)
+
+def init_centers_rgb(colors, weights, n_clusters, rng):
+    """
+    Memilih centroid awal KMeans dari warna-warna pada histogram dengan k-means++ berbobot.
+
+    Args:
+        colors (numpy.ndarray): Array warna (Nx3).
+        weights (numpy.ndarray): Bobot (jumlah piksel) setiap warna.
+        n_clusters (int): Jumlah kluster.
+        rng (numpy.random.Generator): Generator bilangan acak.
+
+    Returns:
+        numpy.ndarray: Centroid awal (kx3).
+    """
+    centers = np.empty((n_clusters, 3))
+    centers[0] = colors[rng.choice(len(colors), p=weights / weights.sum())]
+    closest_dist = ((colors - centers[0]) ** 2).sum(axis=1)
+    for j in range(1, n_clusters):
+        probs = weights * closest_dist
+        centers[j] = colors[rng.choice(len(colors), p=probs / probs.sum())]
+        closest_dist = np.minimum(closest_dist, ((colors - centers[j]) ** 2).sum(axis=1))
+    return centers
+
+def fit_kmeans_rgb(colors, weights, n_clusters, n_iter=100, n_init=1, random_state=42):
+    """
+    Melakukan KMeans clustering berbobot pada warna RGB.
+
+    Args:
+        colors (numpy.ndarray): Array warna (Nx3).
+        weights (numpy.ndarray): Bobot (jumlah piksel) setiap warna.
+        n_clusters (int): Jumlah kluster.
+        n_iter (int): Jumlah iterasi Lloyd maksimum.
+        n_init (int): Jumlah percobaan inisialisasi; hasil dengan WCSS terkecil dipilih.
+        random_state (int): Seed untuk inisialisasi centroid.
+
+    Returns:
+        tuple: Centroid akhir, label setiap warna, dan nilai WCSS.
+    """
+    rng = np.random.default_rng(random_state)
+    best_fit = None
+    for _ in range(n_init):
+        centers = init_centers_rgb(colors, weights, n_clusters, rng)
+        fit = lloyd_rgb(colors, weights, centers, n_iter)
+        if best_fit is None or fit[2] < best_fit[2]:
+            best_fit = fit
+    return best_fit